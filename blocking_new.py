@@ -1,86 +1,151 @@
 import json
 from collections import defaultdict
-import itertools
-from typing import Dict, List
+from typing import Callable, Dict, List, Tuple
 
 # Resolution keys to look for in the features map
 RESOLUTION_KEYS = ["recommended resolution", "resolution", "native resolution", "vertical resolution"]
 
-# Keywords to look for in the title
-KEYWORDS = {"led", "lcd", "ledlcd", "plasma"}
-
-def extract_resolution(features: Dict[str, str]) -> str:
-    """Extract resolution from the features map."""
-    for key in RESOLUTION_KEYS:
-        if key in features:
-            return features[key]
-    # Fallback: Look for any key containing 'resolution'
-    for key in features:
-        if "resolution" in key.lower():
-            return features[key]
-    return "unknown"
-
-def create_primary_blocks(data: List[Dict]) -> Dict[str, List[str]]:
-    """Create primary blocks based on brand, keywords, and resolution."""
+# Keywords to look for in the title, in priority order
+KEYWORDS = ("led", "lcd", "ledlcd", "plasma")
+
+# How each blocking attribute is resolved per product:
+#   "field"          - top-level product field, used unless it is "unknown"
+#   "keys"           - featuresMap keys in priority order
+#   "contains"       - fallback substring any other featuresMap key may contain
+#   "title_keywords" - title tokens in priority order
+ATTRIBUTE_RULES = {
+    "brand": {"field": "brand"},
+    "keyword": {"title_keywords": KEYWORDS},
+    "resolution": {"keys": RESOLUTION_KEYS, "contains": "resolution"},
+}
+
+# Multi-key blocking scheme: every tuple in "primary" is one block key made of
+# attributes that must all be known. Products without any primary block fall
+# back to bi-grams over the last "secondary_tokens" title tokens.
+BLOCKING_SCHEME = {
+    "primary": [("brand", "keyword", "resolution")],
+    "secondary_tokens": 5,
+}
+
+def collect_feature_keys(data: List[Dict]) -> set:
+    """Collect the distinct featuresMap keys of all products."""
+    return set().union(*(product.get("featuresMap", {}) for product in data))
+
+def build_key_resolution_map(feature_keys, rules: Dict[str, Dict] = ATTRIBUTE_RULES) -> Dict[str, Tuple]:
+    """
+    Resolve, once over the distinct featuresMap keys, which keys can supply each attribute.
+    Each attribute maps to (field, preferred keys, fallback keys, title keywords), where the
+    preferred keys are only those that occur in the data and the fallback keys are every
+    other key containing the attribute's substring.
+    """
+    resolution_map = {}
+    for attribute, rule in rules.items():
+        preferred = tuple(key for key in rule.get("keys", ()) if key in feature_keys)
+        contains = rule.get("contains")
+        fallback = frozenset(key for key in feature_keys if contains in key.lower()) if contains else frozenset()
+        resolution_map[attribute] = (rule.get("field"), preferred, fallback, tuple(rule.get("title_keywords", ())))
+    return resolution_map
+
+def compile_resolver(resolution: Tuple) -> Callable[[Dict], str]:
+    """Build a function resolving one attribute of a product from its entry in the key resolution map."""
+    field, preferred, fallback, title_keywords = resolution
+
+    def resolve(product):
+        if field:
+            value = str(product.get(field, "unknown")).lower()
+            if value != "unknown":
+                return value
+        if preferred or fallback:
+            features = product.get("featuresMap", {})
+            for key in preferred:
+                if key in features:
+                    return str(features[key]).lower()
+            # Fallback: the first key containing the attribute's substring
+            if fallback and not fallback.isdisjoint(features):
+                for key in features:
+                    if key in fallback:
+                        return str(features[key]).lower()
+        if title_keywords:
+            title_tokens = product.get("title_tokens", [])
+            for keyword in title_keywords:
+                if keyword in title_tokens:
+                    return keyword
+        return "unknown"
+
+    return resolve
+
+def compute_block_keys(data: List[Dict], scheme: Dict = BLOCKING_SCHEME,
+                       rules: Dict[str, Dict] = ATTRIBUTE_RULES) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+    """Compute primary and secondary blocks in a single pass over the products."""
+    resolution_map = build_key_resolution_map(collect_feature_keys(data), rules)
+    resolvers = {attribute: compile_resolver(resolution) for attribute, resolution in resolution_map.items()}
+    primary_keys = [[resolvers[attribute] for attribute in key_attributes] for key_attributes in scheme["primary"]]
+    num_tokens = scheme.get("secondary_tokens", 5)
+
     primary_blocks = defaultdict(list)
+    all_primary_ids = set()
+    pending_secondary = []
 
     for product in data:
         product_id = product.get("modelID")
-        brand = product.get("brand", "unknown").lower()
-        features = product.get("featuresMap", {})
-        title = product.get("title", "").lower()
-
-        # Extract resolution
-        resolution = extract_resolution(features).lower()
-
-        # Check for keywords in the title
-        title_tokens = set(product.get("title_tokens", []))
-        keyword = next((kw for kw in KEYWORDS if kw in title_tokens), "unknown")
-
-        if brand != "unknown" and keyword != "unknown" and resolution != "unknown":
-            block_key = f"{brand}-{keyword}-{resolution}"
-            primary_blocks[block_key].append(product_id)
-
-    return primary_blocks
-
-def generate_bi_grams(tokens: List[str]) -> List[str]:
-    """Generate bi-grams from a list of tokens."""
-    return [' '.join(pair) for pair in zip(tokens, tokens[1:])]
 
-def create_secondary_blocks(data: List[Dict], primary_blocks: Dict[str, List[str]]) -> Dict[str, List[str]]:
-    """Create secondary blocks using bi-grams for products not in primary blocks."""
+        # Attributes shared by several block keys are resolved at most once,
+        # and a block key is abandoned at its first unknown attribute
+        resolved = {}
+        for key_resolvers in primary_keys:
+            values = []
+            for resolve in key_resolvers:
+                value = resolved.get(resolve)
+                if value is None:
+                    value = resolved[resolve] = resolve(product)
+                if value == "unknown":
+                    break
+                values.append(value)
+            else:
+                primary_blocks["-".join(values)].append(product_id)
+                all_primary_ids.add(product_id)
+
+        if product_id not in all_primary_ids:
+            pending_secondary.append(product)
+
+    # Duplicates share a modelID, so a product is only placed in secondary blocks
+    # if none of its duplicates made it into a primary block; bi-grams are only
+    # generated for the products that remain
     secondary_blocks = defaultdict(list)
-
-    # Get all products already in primary blocks
-    all_primary_ids = set(itertools.chain.from_iterable(primary_blocks.values()))
-
-    for product in data:
+    for product in pending_secondary:
         product_id = product.get("modelID")
         if product_id in all_primary_ids:
             continue
-
         title_tokens = product.get("title_tokens", [])
-        bi_grams = generate_bi_grams(title_tokens[-5:])  # Use last 5 tokens for bi-grams
-
-        for bi_gram in bi_grams:
+        for bi_gram in generate_bi_grams(title_tokens[-num_tokens:]):
             secondary_blocks[bi_gram].append(product_id)
 
-    return secondary_blocks
+    return primary_blocks, secondary_blocks
+
+def create_primary_blocks(data: List[Dict], scheme: Dict = BLOCKING_SCHEME) -> Dict[str, List[str]]:
+    """Create primary blocks based on brand, keywords, and resolution."""
+    primary_blocks, _ = compute_block_keys(data, scheme)
+    return primary_blocks
+
+def generate_bi_grams(tokens: List[str]) -> List[str]:
+    """Generate bi-grams from a list of tokens."""
+    return [' '.join(pair) for pair in zip(tokens, tokens[1:])]
 
-def main(input_file="cleaned_data.json", primary_output="primary_blocks.json", secondary_output="secondary_blocks.json"):
+def main(input_file="cleaned_data.json", primary_output="primary_blocks.json", secondary_output="secondary_blocks.json",
+         scheme=BLOCKING_SCHEME):
     """Main function to generate primary and secondary blocks."""
     with open(input_file, "r") as f:
         data = json.load(f)
 
+    # Create primary and secondary blocks in one pass
+    primary_blocks, secondary_blocks = compute_block_keys(data, scheme)
 
-    # Create primary blocks
-    primary_blocks = create_primary_blocks(data)
+    # Save primary blocks
     with open(primary_output, "w") as f:
         json.dump(primary_blocks, f, indent=4)
     print(f"Primary blocks saved to {primary_output}")
 
-    # Create secondary blocks
-    secondary_blocks = create_secondary_blocks(data, primary_blocks)
+    # Save secondary blocks
     with open(secondary_output, "w") as f:
         json.dump(secondary_blocks, f, indent=4)
     print(f"Secondary blocks saved to {secondary_output}")
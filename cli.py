@@ -0,0 +1,161 @@
+import argparse
+import os
+import sys
+import time
+
+# Every stage module is imported inside its handler, so a run only pays for
+# the dependencies (numpy, scipy, tqdm, ...) of the stage it executes
+_START = time.perf_counter()
+
+def process_start_time():
+    """Wall-clock time this process was created, read from /proc, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/stat") as f:
+            # starttime is field 22, counted in clock ticks since boot; fields restart after the ")" of the command name
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return time.time() - uptime + start_ticks / os.sysconf("SC_CLK_TCK")
+
+def report_timing(command):
+    """
+    Print the cold-start wall time of the command, from process creation so interpreter
+    startup is included. Without /proc, only the time since cli.py was imported is known,
+    and it is labelled as such; time python cli.py ... measures the full run there.
+    """
+    after_startup = time.perf_counter() - _START
+    created = process_start_time()
+    if created is None:
+        print(f"{command} finished in {after_startup:.3f}s after interpreter startup", file=sys.stderr)
+    else:
+        print(f"{command} finished in {time.time() - created:.3f}s cold start "
+              f"({after_startup:.3f}s after interpreter startup)", file=sys.stderr)
+
+def run_clean(args):
+    from data_cleaning import main
+    main(args.input, args.output)
+
+def run_block(args):
+    from blocking_new import main
+    main(args.input, args.primary_output, args.secondary_output)
+
+def run_merge(args):
+    from feature_extraction_merging import main
+    main(args.input, args.primary_blocks, args.secondary_blocks)
+
+def run_minhash(args):
+    from min_hashing_new import main
+    main(enhanced_case=not args.base_case)
+
+def run_evaluate(args):
+    from main_3 import main
+    main(args.input, args.bootstraps, args.weighted)
+
+def run_query(args):
+    import numpy as np
+    from lsh_forest import build_forest, query_column
+
+    # The forest is rebuilt on every invocation, which costs more than one linear scan;
+    # the sublinear query latency only pays off when build_forest is called once in
+    # process and queried many times, so all requested columns share one build
+    signature_matrix = np.load(args.signatures)
+    forest = build_forest(signature_matrix, num_trees=args.trees)
+    for query in args.column:
+        try:
+            neighbours = query_column(forest, query, args.k)
+        except IndexError:
+            print(f"Column {query} is out of range for {signature_matrix.shape[1]} products", file=sys.stderr)
+            sys.exit(2)
+        for column, similarity in neighbours:
+            print(f"{query}\t{column}\t{similarity:.3f}" if len(args.column) > 1 else f"{column}\t{similarity:.3f}")
+
+def run_benchmark(args):
+    from lsh_forest import main
+    main(args.signatures, args.k)
+
+def run_serve(args):
+    from duplicate_service import main
+    main(args.options, prog=args.prog)
+
+def run_loadgen(args):
+    from load_generator import main
+    main(args.options, prog=args.prog)
+
+def build_parser():
+    # --timing is accepted before or after the stage name; SUPPRESS keeps a stage's
+    # parser from resetting a --timing given before the stage
+    timing = argparse.ArgumentParser(add_help=False)
+    timing.add_argument("--timing", action="store_true", default=argparse.SUPPRESS, help="Report the wall time of the command")
+
+    parser = argparse.ArgumentParser(description="Duplicate detection pipeline.")
+    parser.add_argument("--timing", action="store_true", help="Report the wall time of the command")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    clean = subparsers.add_parser("clean", parents=[timing], help="Clean the raw product data")
+    clean.add_argument("--input", default="TVs-all-merged.json")
+    clean.add_argument("--output", default="cleaned_data.json")
+    clean.set_defaults(handler=run_clean)
+
+    block = subparsers.add_parser("block", parents=[timing], help="Create primary and secondary blocks")
+    block.add_argument("--input", default="cleaned_data.json")
+    block.add_argument("--primary-output", default="primary_blocks.json")
+    block.add_argument("--secondary-output", default="secondary_blocks.json")
+    block.set_defaults(handler=run_block)
+
+    merge = subparsers.add_parser("merge", parents=[timing], help="Merge small blocks and create blocked binary matrices")
+    merge.add_argument("--input", default="cleaned_data.json")
+    merge.add_argument("--primary-blocks", default="primary_blocks.json")
+    merge.add_argument("--secondary-blocks", default="secondary_blocks.json")
+    merge.set_defaults(handler=run_merge)
+
+    minhash = subparsers.add_parser("minhash", parents=[timing], help="Compute MinHash signature matrices")
+    minhash.add_argument("--base-case", action="store_true", help="Hash the full binary matrix instead of the blocks")
+    minhash.set_defaults(handler=run_minhash)
+
+    evaluate = subparsers.add_parser("evaluate", parents=[timing], help="Bootstrap LSH and clustering and report the results")
+    evaluate.add_argument("--input", default="cleaned_data.json")
+    evaluate.add_argument("--bootstraps", type=int, default=10)
+    evaluate.add_argument("--weighted", action="store_true",
+                          help="Score candidate pairs with the weighted title/feature similarity instead of binary Jaccard")
+    evaluate.set_defaults(handler=run_evaluate)
+
+    query = subparsers.add_parser("query", parents=[timing], help="Print the top-k most similar products to one or more products",
+                                  description="Print the top-k most similar products. The forest is built once per run, "
+                                              "so pass several columns to amortise it; for repeated low-latency lookups "
+                                              "use lsh_forest.build_forest and query_column in process.")
+    query.add_argument("column", type=int, nargs="+", help="Columns of the products in the signature matrix")
+    query.add_argument("-k", type=int, default=10)
+    query.add_argument("--signatures", default="signature_matrices/signature_matrix.npy")
+    query.add_argument("--trees", type=int, default=8)
+    query.set_defaults(handler=run_query)
+
+    benchmark = subparsers.add_parser("benchmark", parents=[timing], help="Benchmark top-k queries against brute force")
+    benchmark.add_argument("-k", type=int, default=10)
+    benchmark.add_argument("--signatures", default="signature_matrices/signature_matrix.npy")
+    benchmark.set_defaults(handler=run_benchmark)
+
+    # serve and loadgen leave -h/--help to the stage's own parser, which knows their options
+    serve = subparsers.add_parser("serve", parents=[timing], add_help=False,
+                                  help="Run the duplicate check service (options are passed through)")
+    serve.set_defaults(handler=run_serve, passthrough=True, prog=serve.prog)
+
+    loadgen = subparsers.add_parser("loadgen", parents=[timing], add_help=False,
+                                    help="Generate load against the service (options are passed through)")
+    loadgen.set_defaults(handler=run_loadgen, passthrough=True, prog=loadgen.prog)
+
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args, options = parser.parse_known_args(argv)
+    if options and not getattr(args, "passthrough", False):
+        parser.error(f"unrecognized arguments: {' '.join(options)}")
+    args.options = options
+    args.handler(args)
+    if args.timing:
+        report_timing(args.command)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import numpy as np
 from scipy.cluster.hierarchy import linkage, fcluster
+from scipy.sparse import csr_matrix
 from scipy.spatial.distance import squareform
+from feature_extraction_merging import extract_title_words
 
 
 
@@ -23,6 +25,91 @@ def jaccard_similarity(binary_matrix, candidate_pairs):
 
 
 
+def build_similarity_arrays(products):
+    """
+    Precompute the per-product arrays used by weighted_similarity: sparse title model-word,
+    featuresMap key and featuresMap key-value indicator matrices, plus a shop id per product.
+    """
+    word_ids, key_ids, value_ids, shop_ids = {}, {}, {}, {}
+    title_rows, title_cols, feature_rows, key_cols, value_cols, shops = [], [], [], [], [], []
+
+    for idx, product in enumerate(products):
+        for word in extract_title_words(product.get("title", "")):
+            title_rows.append(idx)
+            title_cols.append(word_ids.setdefault(word, len(word_ids)))
+        for key, value in product.get("featuresMap", {}).items():
+            feature_rows.append(idx)
+            key_cols.append(key_ids.setdefault(key, len(key_ids)))
+            value_cols.append(value_ids.setdefault((key, str(value).strip()), len(value_ids)))
+        shop = product.get("shop", "")
+        shops.append(shop_ids.setdefault(shop, len(shop_ids)) if shop else -1)  # -1: unknown shop
+
+    num_products = len(products)
+
+    def indicator(rows, cols, width):
+        return csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(num_products, max(width, 1)))
+
+    title_matrix = indicator(title_rows, title_cols, len(word_ids))
+    return {
+        "title": title_matrix,
+        "title_sizes": np.asarray(title_matrix.sum(axis=1)).ravel(),
+        "keys": indicator(feature_rows, key_cols, len(key_ids)),
+        "values": indicator(feature_rows, value_cols, len(value_ids)),
+        "shops": np.array(shops, dtype=np.int64),
+    }
+
+def _rowwise_overlap(matrix, left, right):
+    """Number of shared non-zero columns between rows left[k] and right[k], for every k."""
+    return np.asarray(matrix[left].multiply(matrix[right]).sum(axis=1)).ravel()
+
+def weighted_similarity(similarity_arrays, candidate_pairs, title_weight=0.6, feature_weight=0.4,
+                        min_shared_keys=1, batch_size=10000):
+    """
+    Compute weighted dissimilarity for candidate pairs, in the same format as jaccard_similarity.
+    The similarity combines the Jaccard overlap of title model words with the fraction of shared
+    featuresMap keys whose values agree. Pairs sharing fewer than min_shared_keys keys fall back
+    to the title score alone. A pair of the same product has distance 0; other pairs from the
+    same shop are never duplicates and get distance 1.
+    """
+    if title_weight < 0 or feature_weight < 0 or title_weight + feature_weight <= 0:
+        raise ValueError(f"Weights must be non-negative with a positive sum, got title_weight={title_weight}, "
+                         f"feature_weight={feature_weight}")
+    if not candidate_pairs:
+        print("No candidate pairs found. Skipping clustering.")
+        return []
+
+    pairs = list(candidate_pairs)
+    total_weight = title_weight + feature_weight
+    title_sizes, shops = similarity_arrays["title_sizes"], similarity_arrays["shops"]
+
+    jaccard_distances = {}
+    for start in range(0, len(pairs), batch_size):
+        batch = np.array(pairs[start:start + batch_size], dtype=np.int64)
+        left, right = batch[:, 0], batch[:, 1]
+
+        title_overlap = _rowwise_overlap(similarity_arrays["title"], left, right)
+        title_union = title_sizes[left] + title_sizes[right] - title_overlap
+        title_score = np.divide(title_overlap, title_union, out=np.zeros(len(batch)), where=title_union > 0)
+
+        shared_keys = _rowwise_overlap(similarity_arrays["keys"], left, right)
+        matching_values = _rowwise_overlap(similarity_arrays["values"], left, right)
+        feature_score = np.divide(matching_values, shared_keys, out=np.zeros(len(batch)), where=shared_keys > 0)
+
+        score = np.where(
+            shared_keys >= max(min_shared_keys, 1),
+            (title_weight * title_score + feature_weight * feature_score) / total_weight,
+            title_score,
+        )
+        # A product always shares its own shop, so identical pairs are excluded from the mask
+        identical = left == right
+        score[identical] = 1.0
+        same_shop = (shops[left] == shops[right]) & (shops[left] >= 0) & ~identical
+        score[same_shop] = 0.0
+
+        jaccard_distances.update(zip(pairs[start:start + batch_size], (1 - score).tolist()))
+
+    return jaccard_distances
+
 def perform_clustering(jaccard_distances, threshold):
     # Early exit if no candidate pairs
     if not jaccard_distances:
@@ -1,6 +1,12 @@
 import json
 import re
 
+# Predefined list of known brands
+KNOWN_BRANDS = {"samsung", "sony", "lg", "panasonic", "sharp", "philips", "toshiba", "vizio", "hisense", "tcl", "vu", "walton" , "akai", "xiaomi", "arise", "itel", "jvc", 
+            "tp vision", "arcam", "micromax", "seiki", "element", "kogan", "duraband", "jensen", "westinghouse", "google", "vizio", "apple", "fujitsu", "tatung",
+            "marantz", "skyworth", "proscan", "onida", "sansui", "haier", "konka", "planar" , "funai", "vestel", "videocon", "hitachi", "memorex", "sanyo", "salora", "zenith",
+            "thomson", "alba" , "bush" , "loewe", "telefunken", "metz", "pensonic" , "rediffusion", "saba", "tpv", "magnavox", "bang", "cge", "changhong", "compal", "curtis", "finlux"}
+
 # Load the JSON file
 def load_json(file_path):
     with open(file_path, 'r') as file:
@@ -111,21 +117,15 @@ def save_cleaned_data(data, output_path):
         json.dump(data, file, indent=4)
 
 # Main execution
-if __name__ == "__main__":
-    file_path = "TVs-all-merged.json"  # Input JSON file
-    output_path = "cleaned_data.json"  # Output JSON file
-
-    # Predefined list of known brands
-    known_brands = {"samsung", "sony", "lg", "panasonic", "sharp", "philips", "toshiba", "vizio", "hisense", "tcl", "vu", "walton" , "akai", "xiaomi", "arise", "itel", "jvc", 
-                    "tp vision", "arcam", "micromax", "seiki", "element", "kogan", "duraband", "jensen", "westinghouse", "google", "vizio", "apple", "fujitsu", "tatung",
-                    "marantz", "skyworth", "proscan", "onida", "sansui", "haier", "konka", "planar" , "funai", "vestel", "videocon", "hitachi", "memorex", "sanyo", "salora", "zenith",
-                    "thomson", "alba" , "bush" , "loewe", "telefunken", "metz", "pensonic" , "rediffusion", "saba", "tpv", "magnavox", "bang", "cge", "changhong", "compal", "curtis", "finlux"}
-
+def main(file_path="TVs-all-merged.json", output_path="cleaned_data.json"):
     # Load, clean, and save the data
     raw_data = load_json(file_path)
     print(f"Loaded data type: {type(raw_data)}, number of products: {len(raw_data)}")  # Debug print
-    cleaned_data = clean_product_data(raw_data, known_brands)
+    cleaned_data = clean_product_data(raw_data, KNOWN_BRANDS)
     save_cleaned_data(cleaned_data, output_path)
 
     print(f"Cleaned data saved to {output_path}")
 
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from data_cleaning import KNOWN_BRANDS, clean_product_data
+from feature_extraction_merging import extract_title_words, extract_feature_words
+from min_hashing_new import compute_hash, next_prime
+
+# Index worker processes load once and reuse for every batch
+_WORKER_INDEX = None
+
+def extract_model_words(product):
+    """Model words of a cleaned product: title model words plus feature-value model words."""
+    feature_values = [value for value in product.get("featuresMap", {}).values() if isinstance(value, str)]
+    return extract_title_words(product.get("title", "")) | extract_feature_words(feature_values)
+
+def build_index(products, num_hashes=100, r=5, b=20, seed=42):
+    """Build a MinHash/LSH index over cleaned products."""
+    product_words = [extract_model_words(product) for product in products]
+    vocabulary = sorted(set().union(*product_words))
+    word_to_row = {word: row for row, word in enumerate(vocabulary)}
+
+    prime = next_prime(len(vocabulary))
+    rng = np.random.default_rng(seed)
+    a_values = rng.integers(1, prime, size=num_hashes)
+    b_values = rng.integers(0, prime, size=num_hashes)
+
+    index = {
+        "vocabulary": vocabulary,
+        "model_ids": [product.get("modelID", "unknown") for product in products],
+        "shops": [product.get("shop", "") for product in products],
+        "a_values": a_values,
+        "b_values": b_values,
+        "prime": prime,
+        "r": r,
+        "b": b,
+    }
+    finalize_index(index)
+    index["signature_matrix"] = compute_signatures(index, [[word_to_row[word] for word in words] for words in product_words])
+    index["buckets"] = build_buckets(index["signature_matrix"], r, b)
+    return index
+
+def finalize_index(index):
+    """Precompute the lookup tables that are not stored on disk."""
+    index["word_to_row"] = {word: row for row, word in enumerate(index["vocabulary"])}
+    rows = np.arange(len(index["vocabulary"]), dtype=np.int64)
+    # Hash value of every vocabulary row for every hash function, so a signature is a column-wise min
+    index["row_hashes"] = compute_hash(index["a_values"][:, None], index["b_values"][:, None], rows[None, :], index["prime"])
+
+def compute_signatures(index, batch_rows):
+    """Compute MinHash signatures for a batch of products given their vocabulary rows."""
+    row_hashes = index["row_hashes"]
+    signatures = np.full((row_hashes.shape[0], len(batch_rows)), np.iinfo(np.int64).max, dtype=np.int64)
+    lengths = np.array([len(rows) for rows in batch_rows])
+    non_empty = np.nonzero(lengths)[0]
+    if len(non_empty):
+        flat_rows = np.concatenate([batch_rows[i] for i in non_empty]).astype(np.int64)
+        starts = np.concatenate([[0], np.cumsum(lengths[non_empty])[:-1]])
+        signatures[:, non_empty] = np.minimum.reduceat(row_hashes[:, flat_rows], starts, axis=1)
+    return signatures
+
+def band_keys(signature_matrix, r, b):
+    """Byte key of every band of every column, shape (b, num_cols)."""
+    num_cols = signature_matrix.shape[1]
+    bands = signature_matrix[:r * b, :].T.reshape(num_cols, b, r)
+    raw = np.ascontiguousarray(bands).tobytes()
+    width = r * signature_matrix.itemsize
+    return [[raw[(col * b + band) * width:(col * b + band + 1) * width] for col in range(num_cols)] for band in range(b)]
+
+def build_buckets(signature_matrix, r, b):
+    """Map each band key to the indexed columns that share it."""
+    buckets = [defaultdict(list) for _ in range(b)]
+    for band, keys in enumerate(band_keys(signature_matrix, r, b)):
+        for col, key in enumerate(keys):
+            buckets[band][key].append(col)
+    return buckets
+
+def save_index(index, path):
+    """Save the index arrays and vocabulary to a .npz file."""
+    np.savez_compressed(
+        path,
+        vocabulary=np.array(index["vocabulary"]),
+        model_ids=np.array(index["model_ids"]),
+        shops=np.array(index["shops"]),
+        a_values=index["a_values"],
+        b_values=index["b_values"],
+        params=np.array([index["prime"], index["r"], index["b"]]),
+        signature_matrix=index["signature_matrix"],
+    )
+
+def load_index(path):
+    """Load an index saved by save_index and rebuild its lookup tables."""
+    stored = np.load(path)
+    prime, r, b = (int(value) for value in stored["params"])
+    index = {
+        "vocabulary": stored["vocabulary"].tolist(),
+        "model_ids": stored["model_ids"].tolist(),
+        "shops": stored["shops"].tolist(),
+        "a_values": stored["a_values"],
+        "b_values": stored["b_values"],
+        "prime": prime,
+        "r": r,
+        "b": b,
+        "signature_matrix": stored["signature_matrix"],
+    }
+    finalize_index(index)
+    index["buckets"] = build_buckets(index["signature_matrix"], r, b)
+    return index
+
+def validate_product(product):
+    """Return why a raw product payload cannot be checked, or None if it is well formed."""
+    if not isinstance(product, dict):
+        return "product must be a JSON object"
+    if not isinstance(product.get("title"), str):
+        return "product title must be a string"
+    for field in ("modelID", "shop"):
+        if field in product and not isinstance(product[field], str):
+            return f"product {field} must be a string"
+    features = product.get("featuresMap", {})
+    if not isinstance(features, dict) or not all(isinstance(value, str) for value in features.values()):
+        return "product featuresMap must map keys to string values"
+    return None
+
+def score_candidates(index, product, signature, candidates, threshold, max_results):
+    """Rank a product's LSH candidates by estimated Jaccard and keep those above the threshold."""
+    columns = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+    scores = np.mean(index["signature_matrix"][:, columns] == signature[:, None], axis=0)
+    ranked = np.argsort(-scores, kind="stable")
+    matches = []
+    for j in ranked:
+        if scores[j] < threshold or len(matches) >= max_results:
+            break
+        column = int(columns[j])
+        # Offers from the same shop are never duplicates of each other
+        if product["shop"] and index["shops"][column] == product["shop"]:
+            continue
+        matches.append({"index": column, "modelID": index["model_ids"][column], "similarity": float(scores[j])})
+    return matches
+
+def check_batch(index, raw_products, threshold=0.5, max_results=10):
+    """
+    Clean, shingle and MinHash a batch of raw products in one vectorized pass,
+    then look up their LSH candidates and keep those above the similarity threshold.
+    Each product is cleaned and scored on its own, so a product that fails gets
+    {"error": ...} as its result without affecting the rest of the batch.
+    """
+    results = [None] * len(raw_products)
+    cleaned, positions, batch_rows = [], [], []
+    word_to_row = index["word_to_row"]
+    for position, raw_product in enumerate(raw_products):
+        try:
+            product = clean_product_data([raw_product], KNOWN_BRANDS)[0]
+            rows = [word_to_row[word] for word in extract_model_words(product) if word in word_to_row]
+        except Exception as e:
+            results[position] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        cleaned.append(product)
+        positions.append(position)
+        batch_rows.append(rows)
+
+    signatures = compute_signatures(index, batch_rows)
+    candidates = [set() for _ in cleaned]
+    for band, keys in enumerate(band_keys(signatures, index["r"], index["b"])):
+        for i, key in enumerate(keys):
+            candidates[i].update(index["buckets"][band].get(key, ()))
+
+    for i, product in enumerate(cleaned):
+        if not batch_rows[i] or not candidates[i]:
+            results[positions[i]] = []
+            continue
+        try:
+            results[positions[i]] = score_candidates(index, product, signatures[:, i], candidates[i], threshold, max_results)
+        except Exception as e:
+            results[positions[i]] = {"error": f"{type(e).__name__}: {e}"}
+    return results
+
+def _init_worker(index_path):
+    global _WORKER_INDEX
+    _WORKER_INDEX = load_index(index_path)
+
+def _worker_ready():
+    return _WORKER_INDEX is not None
+
+def _check_batch_in_worker(raw_products, threshold, max_results):
+    return check_batch(_WORKER_INDEX, raw_products, threshold, max_results)
+
+def _fail_requests(items, error):
+    """Resolve the futures of queued (product, future, queued_at) items that are still waiting with an error."""
+    for _, future, _ in items:
+        if not future.done():
+            future.set_exception(error)
+
+class DuplicateService:
+    """
+    Micro-batching front end: concurrent requests are queued and flushed to the
+    worker pool as one batch when max_batch_size is reached or max_wait_ms passes.
+    """
+
+    def __init__(self, index_path, num_workers=None, max_batch_size=64, max_wait_ms=5.0,
+                 threshold=0.5, max_results=10, window=10000):
+        self.index_path = index_path
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.threshold = threshold
+        self.max_results = max_results
+        self.queue = None
+        self.pool = None
+        # asyncio only keeps weak references to tasks, so in-flight batches are held here
+        self.batch_tasks = set()
+        self.latencies = deque(maxlen=window)
+        # (queued, finished) times of the same recent requests, for windowed throughput
+        self.request_times = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.completed = 0
+        self.started = None
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.pool = ProcessPoolExecutor(self.num_workers, initializer=_init_worker, initargs=(self.index_path,))
+        self.slots = asyncio.Semaphore(self.num_workers)
+        # Spawn the workers and load their index before the first request arrives
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _worker_ready) for _ in range(self.num_workers)))
+        self.started = time.perf_counter()
+        self.batcher = asyncio.create_task(self._batch_loop())
+
+    async def stop(self):
+        """Stop batching, let in-flight batches resolve their requests, then shut the pool down off the event loop."""
+        self.batcher.cancel()
+        await asyncio.gather(self.batcher, return_exceptions=True)
+        await asyncio.gather(*self.batch_tasks, return_exceptions=True)
+        # Requests still queued were never batched; fail them instead of leaving them waiting
+        while not self.queue.empty():
+            _fail_requests([self.queue.get_nowait()], RuntimeError("service stopped"))
+        await asyncio.get_running_loop().run_in_executor(None, self.pool.shutdown)
+
+    async def check(self, raw_product):
+        """Queue one raw product and wait for its matches."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((raw_product, future, time.perf_counter()))
+        return await future
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            try:
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                await self.slots.acquire()
+            except asyncio.CancelledError:
+                _fail_requests(batch, RuntimeError("service stopped"))
+                raise
+            task = asyncio.create_task(self._run_batch(batch))
+            self.batch_tasks.add(task)
+            task.add_done_callback(self.batch_tasks.discard)
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self.pool, _check_batch_in_worker, [item[0] for item in batch], self.threshold, self.max_results
+            )
+        except Exception as e:
+            _fail_requests(batch, e)
+            return
+        finally:
+            self.slots.release()
+
+        finished = time.perf_counter()
+        self.batch_sizes.append(len(batch))
+        for (_, future, queued), result in zip(batch, results):
+            self.latencies.append(finished - queued)
+            self.request_times.append((queued, finished))
+            self.completed += 1
+            if future.done():
+                continue
+            if isinstance(result, dict) and "error" in result:
+                future.set_exception(ValueError(result["error"]))
+            else:
+                future.set_result(result)
+
+    def busy_time(self):
+        """Total time in the recent window during which at least one request was in flight."""
+        busy, current_start, current_end = 0.0, None, None
+        for queued, finished in sorted(self.request_times):
+            if current_end is None or queued > current_end:
+                if current_end is not None:
+                    busy += current_end - current_start
+                current_start, current_end = queued, finished
+            else:
+                current_end = max(current_end, finished)
+        if current_end is not None:
+            busy += current_end - current_start
+        return busy
+
+    def metrics(self):
+        """
+        Latency percentiles and throughput over the same window of recent requests.
+        Throughput divides those requests by the time any of them was in flight,
+        so idle periods between bursts do not count against it.
+        """
+        uptime = time.perf_counter() - self.started if self.started else 0.0
+        latencies_ms = np.array(self.latencies) * 1000
+        busy = self.busy_time()
+        throughput = len(self.request_times) / busy if busy > 0 else 0.0
+        return {
+            "completed": self.completed,
+            "uptime_s": uptime,
+            "throughput_rps": throughput,
+            "p50_ms": float(np.percentile(latencies_ms, 50)) if len(latencies_ms) else 0.0,
+            "p99_ms": float(np.percentile(latencies_ms, 99)) if len(latencies_ms) else 0.0,
+            "mean_batch_size": float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0,
+        }
+
+async def _send_json(writer, status, payload):
+    body = json.dumps(payload).encode()
+    reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}[status]
+    writer.write(
+        f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+        + body
+    )
+    await writer.drain()
+
+async def handle_check(service, body):
+    """Validate a POST /check body and return the response status and payload."""
+    try:
+        payload = json.loads(body)
+    except json.JSONDecodeError:
+        return 400, {"error": "invalid JSON"}
+    products = payload if isinstance(payload, list) else [payload]
+    errors = [error for error in map(validate_product, products) if error]
+    if errors:
+        return 400, {"error": errors[0]}
+    try:
+        if isinstance(payload, list):
+            result = await asyncio.gather(*(service.check(product) for product in payload))
+        else:
+            result = await service.check(payload)
+    except Exception as e:
+        return 500, {"error": str(e)}
+    return 200, {"matches": result}
+
+async def handle_connection(service, reader, writer):
+    """
+    Minimal keep-alive HTTP/1.1 handler.
+    POST /check takes one raw product (or a list of them) and returns its matches; GET /metrics returns metrics.
+    """
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, path, _ = request_line.decode().split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode().partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+            if method == "GET" and path == "/metrics":
+                await _send_json(writer, 200, service.metrics())
+            elif method == "POST" and path == "/check":
+                status, response = await handle_check(service, body)
+                await _send_json(writer, status, response)
+            else:
+                await _send_json(writer, 404, {"error": "not found"})
+
+            if headers.get("connection", "").lower() == "close":
+                break
+    except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+async def serve(index_path, host="127.0.0.1", port=8080, **service_options):
+    service = DuplicateService(index_path, **service_options)
+    await service.start()
+    server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+    print(f"Duplicate check service listening on http://{host}:{port} with {service.num_workers} workers.")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Serve duplicate checks against a MinHash/LSH index.")
+    parser.add_argument("--data", default="cleaned_data.json", help="Cleaned products used to build the index")
+    parser.add_argument("--index", default="duplicate_index.npz", help="Index file, built from --data if missing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.index):
+        with open(args.data, "r") as f:
+            products = json.load(f)
+        save_index(build_index(products), args.index)
+        print(f"Index built over {len(products)} products and saved to {args.index}")
+
+    asyncio.run(serve(args.index, args.host, args.port, num_workers=args.workers,
+                      max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms, threshold=args.threshold))
+
+if __name__ == "__main__":
+    main()
@@ -85,19 +85,28 @@ def merge_small_blocks(blocks, products, min_block_size=3):
 
 
 
+# Map each block's file name key to the product indices of its matrix columns.
+# Blocks only record modelIDs, so every offer sharing a modelID maps to the last product
+# with that modelID: the offers of one model become repeated copies of a single product
+# column, and title/feature scoring never compares two distinct offers of that model
+def block_product_indices(blocks, products):
+    product_id_to_index = {prod["modelID"]: idx for idx, prod in enumerate(products)}
+    block_indices = {}
+    for block_key, block_products in blocks.items():
+        cleaned_block_key = re.sub(r"[^\w\s-]", "", block_key).replace(" ", "_")
+        product_indices = [product_id_to_index.get(prod, -1) for prod in block_products]
+        block_indices[cleaned_block_key] = [idx for idx in product_indices if idx != -1]
+    return block_indices
+
 # Create binary matrices for merged blocks
 def create_blocked_binary_matrices(products, primary_blocks, secondary_blocks):
     os.makedirs("blocked_binary_matrices/primary", exist_ok=True)
     os.makedirs("blocked_binary_matrices/secondary", exist_ok=True)
 
-    product_id_to_index = {prod["modelID"]: idx for idx, prod in enumerate(products)}
     binary_matrix = np.load("binary_matrix.npy")
 
     def save_blocks(blocks, output_dir):
-        for block_key, block_products in blocks.items():
-            cleaned_block_key = re.sub(r"[^\w\s-]", "", block_key).replace(" ", "_")
-            product_indices = [product_id_to_index.get(prod, -1) for prod in block_products]
-            product_indices = [idx for idx in product_indices if idx != -1]
+        for cleaned_block_key, product_indices in block_product_indices(blocks, products).items():
             if product_indices:
                 blocked_matrix = binary_matrix[:, product_indices]
                 np.save(f"{output_dir}/{cleaned_block_key}.npy", blocked_matrix)
@@ -106,11 +115,7 @@ def create_blocked_binary_matrices(products, primary_blocks, secondary_blocks):
     save_blocks(secondary_blocks, "blocked_binary_matrices/secondary")
 
 # Main function
-if __name__ == "__main__":
-    input_file = "cleaned_data.json"
-    primary_blocks_file = "primary_blocks.json"
-    secondary_blocks_file = "secondary_blocks.json"
-
+def main(input_file="cleaned_data.json", primary_blocks_file="primary_blocks.json", secondary_blocks_file="secondary_blocks.json"):
     with open(input_file, "r") as f:
         products = json.load(f)
 
@@ -135,3 +140,7 @@ if __name__ == "__main__":
     # Create binary matrices
     create_blocked_binary_matrices(products, primary_blocks, secondary_blocks)
     print("Binary matrices for merged blocks created.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+
+import numpy as np
+
+from data_cleaning import load_json
+
+async def post_json(reader, writer, host, path, payload):
+    """Send one keep-alive POST request and return the response status code and decoded JSON body."""
+    body = json.dumps(payload).encode()
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+        + body
+    )
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("connection closed by the service")
+    status = int(status_line.split()[1])
+    content_length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.strip().lower() == "content-length":
+            content_length = int(value.strip())
+    return status, json.loads(await reader.readexactly(content_length))
+
+async def fetch_metrics(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET /metrics HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+async def client(host, port, products, num_requests, latencies, errors):
+    """
+    One connection sending num_requests sequential duplicate checks.
+    Only 200 responses contribute latencies; other statuses are tallied in errors.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(num_requests):
+            product = random.choice(products)
+            start = time.perf_counter()
+            status, _ = await post_json(reader, writer, host, "/check", product)
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors[status] += 1
+    finally:
+        writer.close()
+
+async def run_load(host, port, products, concurrency, total_requests):
+    """
+    Run concurrent clients against a local service and report client-side latency and throughput.
+    Throughput and percentiles cover successful requests only; failed ones are reported as errors.
+    """
+    latencies = []
+    errors = Counter()
+    # Spread the remainder so exactly total_requests are sent
+    per_client = [total_requests // concurrency + (1 if i < total_requests % concurrency else 0) for i in range(concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, products, n, latencies, errors) for n in per_client if n > 0))
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies) + sum(errors.values()),
+        "succeeded": len(latencies),
+        "errors": sum(errors.values()),
+        "error_statuses": dict(errors),
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)) if len(latencies_ms) else 0.0,
+        "p99_ms": float(np.percentile(latencies_ms, 99)) if len(latencies_ms) else 0.0,
+    }
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Generate load against a local duplicate check service.")
+    parser.add_argument("--input", default="TVs-all-merged.json", help="Raw products to send")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    products = load_json(args.input)
+    result = asyncio.run(run_load(args.host, args.port, products, args.concurrency, args.requests))
+    print(f"Client side: {result}")
+    print(f"Server side: {asyncio.run(fetch_metrics(args.host, args.port))}")
+
+if __name__ == "__main__":
+    main()
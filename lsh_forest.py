@@ -0,0 +1,153 @@
+import numpy as np
+import time
+from bisect import bisect_left, bisect_right
+
+def estimated_jaccard(signature_matrix, signature, columns=None):
+    """Estimate Jaccard similarity as the fraction of agreeing MinHash rows."""
+    if columns is not None:
+        signature_matrix = signature_matrix[:, columns]
+    return np.mean(signature_matrix == np.asarray(signature)[:, None], axis=0)
+
+def encode_prefix_keys(signature_rows):
+    """Encode each column of a block of signature rows as a fixed-width byte string."""
+    encoded = np.ascontiguousarray(signature_rows.T.astype(">i8"))
+    width = encoded.shape[1] * 8
+    raw = encoded.tobytes()
+    return [raw[i:i + width] for i in range(0, len(raw), width)]
+
+def build_forest(signature_matrix, num_trees=8, depth=None):
+    """
+    Build an LSH Forest over the columns of a MinHash signature matrix.
+    Each tree stores the columns sorted by a different slice of signature rows,
+    so every prefix of that slice is a contiguous range found by binary search.
+    """
+    signature_matrix = np.asarray(signature_matrix)
+    num_rows = signature_matrix.shape[0]
+    num_trees = max(1, min(num_trees, num_rows))
+    if depth is None:
+        depth = num_rows // num_trees
+    depth = max(1, min(depth, num_rows // num_trees))
+
+    trees = []
+    for tree_idx in range(num_trees):
+        rows = signature_matrix[tree_idx * depth:(tree_idx + 1) * depth, :]
+        keys = encode_prefix_keys(rows)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        trees.append({
+            "keys": [keys[i] for i in order],
+            "columns": np.array(order, dtype=np.int64),
+        })
+
+    return {"signature_matrix": signature_matrix, "trees": trees, "depth": depth}
+
+def query_forest(forest, signature, k=10, exclude=None, candidate_factor=5):
+    """
+    Return the top-k columns most similar to a signature as (column, estimated Jaccard) pairs.
+    The prefix length is shortened across all trees together until at least
+    candidate_factor * k candidates are found; only those candidates are scored.
+    """
+    signature = np.asarray(signature)
+    depth = forest["depth"]
+    width = depth * 8
+    encoded = signature.astype(">i8").tobytes()
+    query_keys = [encoded[tree_idx * width:(tree_idx + 1) * width] for tree_idx in range(len(forest["trees"]))]
+
+    wanted = k * candidate_factor + (1 if exclude is not None else 0)
+    candidates = set()
+    for prefix_len in range(depth, 0, -1):
+        candidates = set()
+        for tree, query_key in zip(forest["trees"], query_keys):
+            prefix = query_key[:prefix_len * 8]
+            lo = bisect_left(tree["keys"], prefix)
+            hi = bisect_right(tree["keys"], prefix + b"\xff" * (len(query_key) - len(prefix)), lo)
+            candidates.update(tree["columns"][lo:hi].tolist())
+        if len(candidates) >= wanted:
+            break
+
+    candidates.discard(exclude)
+    if not candidates:
+        return []
+
+    # Sorted so ties are broken by column and rankings agree across k
+    columns = np.fromiter(sorted(candidates), dtype=np.int64, count=len(candidates))
+    scores = estimated_jaccard(forest["signature_matrix"], signature, columns)
+    ranked = np.argsort(-scores, kind="stable")[:k]
+    return [(int(columns[i]), float(scores[i])) for i in ranked]
+
+def query_column(forest, column, k=10, candidate_factor=5):
+    """Return the top-k neighbours of a column already in the forest, excluding itself."""
+    # Normalise negative columns and reject out-of-range ones, so exclude matches the query itself
+    column = range(forest["signature_matrix"].shape[1])[column]
+    signature = forest["signature_matrix"][:, column]
+    return query_forest(forest, signature, k, exclude=column, candidate_factor=candidate_factor)
+
+def brute_force_top_k(signature_matrix, column, k=10):
+    """Exact top-k by estimated Jaccard over every column, for benchmarking."""
+    scores = estimated_jaccard(signature_matrix, signature_matrix[:, column])
+    scores[column] = -1
+    ranked = np.argsort(-scores, kind="stable")[:k]
+    return [(int(i), float(scores[i])) for i in ranked]
+
+def benchmark_forest(signature_matrix, k=10, num_queries=100, num_trees=8, candidate_factor=5, seed=42):
+    """
+    Compare forest queries against a brute-force scan.
+    Recall@k counts a forest neighbour as correct if its score reaches the k-th exact score,
+    so ties at the cut-off are not penalised.
+    """
+    forest = build_forest(signature_matrix, num_trees=num_trees)
+    num_cols = signature_matrix.shape[1]
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(num_cols, size=min(num_queries, num_cols), replace=False)
+
+    forest_time, brute_time, recalls = 0.0, 0.0, []
+    for column in queries:
+        start = time.perf_counter()
+        approx = query_column(forest, column, k, candidate_factor)
+        forest_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        exact = brute_force_top_k(signature_matrix, column, k)
+        brute_time += time.perf_counter() - start
+
+        if exact:
+            cutoff = exact[-1][1]
+            recalls.append(sum(1 for _, score in approx if score >= cutoff) / len(exact))
+
+    return {
+        "num_products": num_cols,
+        "k": k,
+        "recall_at_k": float(np.mean(recalls)) if recalls else 0.0,
+        "forest_ms_per_query": 1000 * forest_time / len(queries),
+        "brute_force_ms_per_query": 1000 * brute_time / len(queries),
+    }
+
+def synthetic_catalogue(signature_matrix, num_products, min_perturb=0.2, max_perturb=0.8, seed=42):
+    """
+    Build a larger synthetic catalogue for scale benchmarks. Each synthetic product copies a
+    random real signature and replaces a random 20-80% of its rows with fresh hash values,
+    so products resemble the real catalogue without being exact copies of each other.
+    """
+    rng = np.random.default_rng(seed)
+    num_rows, num_cols = signature_matrix.shape
+    base = signature_matrix[:, rng.integers(0, num_cols, size=num_products)].astype(np.int64)
+    perturb = rng.uniform(min_perturb, max_perturb, size=num_products)
+    replace = rng.random((num_rows, num_products)) < perturb
+    base[replace] = rng.integers(0, np.iinfo(np.int32).max, size=int(replace.sum()))
+    return base
+
+def main(signature_path="signature_matrices/signature_matrix.npy", k=10, synthetic_sizes=(10000, 50000)):
+    signature_matrix = np.load(signature_path)
+    print(f"Loaded signature matrix with {signature_matrix.shape[0]} rows and {signature_matrix.shape[1]} products.")
+
+    for candidate_factor in [1, 2, 5]:
+        result = benchmark_forest(signature_matrix, k=k, candidate_factor=candidate_factor)
+        print(f"Real catalogue, candidate_factor={candidate_factor}: {result}")
+
+    for num_products in synthetic_sizes:
+        synthetic = synthetic_catalogue(signature_matrix, num_products)
+        for candidate_factor in [1, 5]:
+            result = benchmark_forest(synthetic, k=k, candidate_factor=candidate_factor)
+            print(f"Synthetic catalogue (perturbed copies), candidate_factor={candidate_factor}: {result}")
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,10 @@ import json
 import os
 import numpy as np
 from tqdm import tqdm
-from sklearn.utils import resample
 from lsh import lsh
-from clustering import jaccard_similarity, perform_clustering
+from clustering import jaccard_similarity, weighted_similarity, build_similarity_arrays, perform_clustering
 from evaluation_lsh import evaluate_lsh
+from feature_extraction_merging import block_product_indices
 
 def evaluate_final_clusters(predicted_clusters, ground_truth_pairs):
     """
@@ -58,8 +58,32 @@ def generate_ground_truth_pairs(products):
 
     return ground_truth_pairs
 
-def bootstrap_and_evaluate(signature_matrix, ground_truth_pairs, r_values, b_values, num_bootstraps, thresholds):
-    """Perform bootstrapping to evaluate LSH and clustering, tuning r, b, and threshold."""
+def resample_indices(indices, n_samples):
+    """Draw n_samples indices with replacement (same draws as sklearn.utils.resample)."""
+    return [indices[i] for i in np.random.randint(0, len(indices), size=n_samples)]
+
+def weighted_distances(similarity_arrays, candidate_pairs, train_indices, column_products=None):
+    """
+    Score LSH candidate pairs with weighted_similarity. Candidate pairs index columns of the
+    resampled train matrix, so they are mapped through train_indices (and column_products,
+    the product index of each signature matrix column) to product indices for scoring, and
+    the distances are returned keyed by the original candidate pairs.
+    Both columns of a pair can map to the same product: bootstrapping resamples with
+    replacement, and block_product_indices maps every offer sharing a modelID to one
+    product, so such pairs are scored as identical (distance 0).
+    """
+    products_of = [column_products[c] if column_products is not None else c for c in train_indices]
+    product_pairs = {pair: (products_of[pair[0]], products_of[pair[1]]) for pair in candidate_pairs}
+    distances = weighted_similarity(similarity_arrays, list(set(product_pairs.values())))
+    return {pair: distances[product_pair] for pair, product_pair in product_pairs.items()}
+
+def bootstrap_and_evaluate(signature_matrix, ground_truth_pairs, r_values, b_values, num_bootstraps, thresholds,
+                           similarity_arrays=None, column_products=None):
+    """
+    Perform bootstrapping to evaluate LSH and clustering, tuning r, b, and threshold.
+    If similarity_arrays is given, candidate pairs are scored with weighted_similarity
+    instead of binary Jaccard over the signature matrix.
+    """
     results = []
     if signature_matrix.shape[1] == 0:
         print("Signature matrix has no columns. Skipping evaluation.")
@@ -82,9 +106,8 @@ def bootstrap_and_evaluate(signature_matrix, ground_truth_pairs, r_values, b_val
 
                 for _ in tqdm(range(num_bootstraps), desc=f"Bootstrap r={r}, b={b}, threshold={threshold:.2f}", leave=False):
                     indices = list(range(signature_matrix.shape[1]))
-                    train_indices = resample(
-                        indices, 
-                        replace=True, 
+                    train_indices = resample_indices(
+                        indices,
                         n_samples=max(1, int(0.63 * len(indices)))  # Ensure n_samples is at least 1
                     )
                     test_indices = [i for i in indices if i not in train_indices]
@@ -110,7 +133,10 @@ def bootstrap_and_evaluate(signature_matrix, ground_truth_pairs, r_values, b_val
                         candidate_pairs, test_ground_truth, total_possible_comparisons
                     )
 
-                    jaccard_distances = jaccard_similarity(train_matrix, candidate_pairs)
+                    if similarity_arrays is not None:
+                        jaccard_distances = weighted_distances(similarity_arrays, candidate_pairs, train_indices, column_products)
+                    else:
+                        jaccard_distances = jaccard_similarity(train_matrix, candidate_pairs)
                     predicted_clusters = perform_clustering(jaccard_distances, threshold)
 
                     if not predicted_clusters:
@@ -140,17 +166,25 @@ def bootstrap_and_evaluate(signature_matrix, ground_truth_pairs, r_values, b_val
 
     return results
 
-if __name__ == "__main__":
-    with open("cleaned_data.json", "r") as f:
+def main(input_file="cleaned_data.json", num_bootstraps=10, weighted=False):
+    with open(input_file, "r") as f:
         products = json.load(f)
 
+    # Weighted scoring needs the product behind each signature matrix column,
+    # recovered from the merged blocks the matrices were built from
+    similarity_arrays, block_columns = None, {}
+    if weighted:
+        similarity_arrays = build_similarity_arrays(products)
+        for block_type in ["primary", "secondary"]:
+            with open(f"merged_{block_type}_blocks.json", "r") as f:
+                block_columns[block_type] = block_product_indices(json.load(f), products)
+
     ground_truth_pairs = generate_ground_truth_pairs(products)
     print(f"Generated {len(ground_truth_pairs)} ground truth pairs.")
 
     r_values = [5, 10, 15, 20, 25, 30, 40, 50, 60, 70, 80, 100, 200]
     b_values = [2, 4, 6, 8, 10, 20, 30, 40, 50, 60, 80, 100, 200]
     thresholds = [0.5, 0.7, 0.6]
-    num_bootstraps = 10
 
     print("\nProcessing Enhanced Case...")
     enhanced_results = []
@@ -163,7 +197,12 @@ if __name__ == "__main__":
                 if signature_matrix.shape[1] == 0:
                     print(f"Signature matrix {file_name} has no columns. Skipping.")
                     continue
-                results = bootstrap_and_evaluate(signature_matrix, ground_truth_pairs, r_values, b_values, num_bootstraps, thresholds)
+                column_products = None
+                if weighted:
+                    block_key = file_name[len("signature_"):-len(".npy")]
+                    column_products = block_columns[block_type][block_key]
+                results = bootstrap_and_evaluate(signature_matrix, ground_truth_pairs, r_values, b_values, num_bootstraps, thresholds,
+                                                 similarity_arrays, column_products)
                 enhanced_results.extend(results)
 
     print("\nAll Results for Enhanced Case:")
@@ -174,3 +213,7 @@ if __name__ == "__main__":
         best_enhanced_result = max(enhanced_results, key=lambda x: x["avg_f1_star"])
         print("\nBest Results for Enhanced Case:")
         print(best_enhanced_result)
+
+
+if __name__ == "__main__":
+    main()
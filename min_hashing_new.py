@@ -1,10 +1,17 @@
 import numpy as np
 import random
-import sympy
 import json
 import re
 import os
 
+# Smallest prime strictly greater than n, by trial division (replaces sympy.nextprime)
+def next_prime(n):
+    candidate = max(2, int(n) + 1)
+    while True:
+        if candidate == 2 or (candidate % 2 and all(candidate % d for d in range(3, int(candidate ** 0.5) + 1, 2))):
+            return candidate
+        candidate += 1
+
 # Function to calculate hash values
 def compute_hash(a, b, row, prime):
     return (a * row + b) % prime
@@ -12,7 +19,7 @@ def compute_hash(a, b, row, prime):
 # Generate MinHash signature matrix
 def generate_signature_matrix(binary_matrix, num_hashes):
     num_rows, num_cols = binary_matrix.shape
-    prime = sympy.nextprime(num_rows)
+    prime = next_prime(num_rows)
 
     random.seed(42)
     a_values = np.random.randint(1, prime, size=num_hashes)
@@ -28,9 +35,7 @@ def generate_signature_matrix(binary_matrix, num_hashes):
 
     return signature_matrix
 
-if __name__ == "__main__":
-    enhanced_case = True
-
+def main(enhanced_case=True):
     if enhanced_case:
         primary_dir = "blocked_binary_matrices/primary"
         secondary_dir = "blocked_binary_matrices/secondary"
@@ -81,3 +86,7 @@ if __name__ == "__main__":
         os.makedirs("signature_matrices", exist_ok=True)
         np.save("signature_matrices/signature_matrix.npy", signature_matrix)
         print("Signature matrix saved for full binary matrix.")
+
+
+if __name__ == "__main__":
+    main()